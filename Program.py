@@ -1,86 +1,83 @@
-import asyncio
+import argparse
 import random
-from spade.agent import Agent
-from spade.message import Message
+from collections import deque
+from dataclasses import dataclass
 import networkx as nx
-import matplotlib.pyplot as plt
 
 NUM_AGENTS = 10
+NUM_EDGES = 15
 TARGET_PRECISION = 1e-4
 MAX_ITER = 50
 
-message_boxes = {f"agent{i}@localhost": [] for i in range(NUM_AGENTS)}
+message_boxes = [deque() for _ in range(NUM_AGENTS)]
 
 
-class ConsensusAgent(Agent):
-    def __init__(self, jid, password, initial_value, neighbours):
-        super().__init__(jid, password)
-        self.value = float(initial_value)
-        self.neighbours = neighbours
+@dataclass(slots=True)
+class ConsensusAgent:
+    jid: str
+    value: float
+    neighbours: tuple[int, ...]
 
-    async def send(self, msg):
-        recipient = str(msg.to).split("/")[0]
-        if recipient in message_boxes:
-            message_boxes[recipient].append(msg)
 
-    async def receive(self, timeout=None):
-        my_jid = str(self.jid).split("/")[0]
-        if message_boxes[my_jid]:
-            return message_boxes[my_jid].pop(0)
-        return None
+def format_state(title, agents):
+    lines = [title]
+    lines.extend(f"  Агент {i}: {agent.value:.6f}" for i, agent in enumerate(agents))
+    return "\n".join(lines) + "\n"
 
 
-async def main():
+def main(plot=False):
     print("Генерируем начальные значения...")
     initial_values = [random.uniform(0, 100) for _ in range(NUM_AGENTS)]
     true_mean = sum(initial_values) / NUM_AGENTS
     print(f"Истинное среднее: {true_mean:.6f}\n")
 
     print("Строим топологию агентов...")
-    G = nx.gnm_random_graph(NUM_AGENTS, 15)
-    while not nx.is_connected(G):
-        G = nx.gnm_random_graph(NUM_AGENTS, 15)
-
-    print("Открываем схему агентов. Закройте окно, чтобы продолжить...\n")
-    plt.figure(figsize=(10, 8))
-    pos = nx.spring_layout(G, seed=42)
-
-    labels = {
-        i: f"agent{i}\n{initial_values[i]:.2f}"
-        for i in range(NUM_AGENTS)
-    }
-
-    nx.draw(
-        G,
-        pos,
-        labels=labels,
-        with_labels=True,
-        node_color="#6a5acd",
-        node_size=2000,
-        font_size=9,
-        font_color="white",
-        font_weight="bold",
-        edge_color="#555555",
-        width=1.5
-    )
-    plt.title("Топология агентов и их загаданные числа", fontsize=14, pad=20)
-    plt.tight_layout()
-    plt.show()
+    G = nx.random_labeled_tree(NUM_AGENTS)
+    while G.number_of_edges() < NUM_EDGES:
+        u, v = random.sample(range(NUM_AGENTS), 2)
+        G.add_edge(u, v)
+
+    if plot:
+        import matplotlib.pyplot as plt
+
+        print("Открываем схему агентов. Закройте окно, чтобы продолжить...\n")
+        plt.figure(figsize=(10, 8))
+        pos = nx.spring_layout(G, seed=42)
+
+        labels = {
+            i: f"agent{i}\n{initial_values[i]:.2f}"
+            for i in range(NUM_AGENTS)
+        }
+
+        nx.draw(
+            G,
+            pos,
+            labels=labels,
+            with_labels=True,
+            node_color="#6a5acd",
+            node_size=2000,
+            font_size=9,
+            font_color="white",
+            font_weight="bold",
+            edge_color="#555555",
+            width=1.5
+        )
+        plt.title("Топология агентов и их загаданные числа", fontsize=14, pad=20)
+        plt.tight_layout()
+        plt.show()
 
     agents = []
     for i in range(NUM_AGENTS):
         jid = f"agent{i}@localhost"
-        neighbours = [f"agent{j}@localhost" for j in G.neighbors(i)]
-        agent = ConsensusAgent(jid, "secret", initial_values[i], neighbours)
+        neighbours = tuple(G.neighbors(i))
+        agent = ConsensusAgent(jid, float(initial_values[i]), neighbours)
         agents.append(agent)
 
-    print("Агенты созданы. Запускаем вычисление общего среднего...\n")
+    # Одно сообщение на агента, переиспользуемое в каждой итерации:
+    # к моменту следующей отправки все очереди уже разобраны.
+    messages = [[i, agent.value] for i, agent in enumerate(agents)]
 
-    current_values = {f"agent{i}@localhost": initial_values[i] for i in range(NUM_AGENTS)}
-    neighbours_map = {
-        f"agent{i}@localhost": [f"agent{j}@localhost" for j in G.neighbors(i)]
-        for i in range(NUM_AGENTS)
-    }
+    print("Агенты созданы. Запускаем вычисление общего среднего...\n")
 
     # --- Счётчики затрат ---
     total_messages = 0
@@ -88,66 +85,55 @@ async def main():
     iterations_done = 0
 
     # Вывод начального состояния
-    print("Начальное состояние агентов:")
-    for i in range(NUM_AGENTS):
-        jid = f"agent{i}@localhost"
-        print(f"  Агент {i}: {current_values[jid]:.6f}")
-    print()
+    print(format_state("Начальное состояние агентов:", agents))
 
     for iteration in range(MAX_ITER):
-        for box in message_boxes.values():
-            box.clear()
-
         # Отправка
-        for jid in current_values:
-            for nb in neighbours_map[jid]:
-                msg = Message(to=nb)
-                msg.body = str(current_values[jid])
-                sender = next(a for a in agents if str(a.jid).split("/")[0] == jid)
-                await sender.send(msg)
-                total_messages += 1
+        for i, agent in enumerate(agents):
+            msg = messages[i]
+            msg[1] = agent.value
+            neighbours = agent.neighbours
+            for nb in neighbours:
+                message_boxes[nb].append(msg)
+            total_messages += len(neighbours)
 
         # Получение и обновление
-        new_values = {}
-        max_diff = 0.0
-        for jid in current_values:
-            received = []
-            agent = next(a for a in agents if str(a.jid).split("/")[0] == jid)
-            while True:
-                msg = await agent.receive()
-                if msg is None:
-                    break
-                try:
-                    received.append(float(msg.body))
-                    total_arith_ops += 1
-                except ValueError:
-                    continue
-
-            all_vals = [current_values[jid]] + received
-            num_vals = len(all_vals)
-            total_arith_ops += (num_vals - 1) + 1
-
-            new_val = sum(all_vals) / num_vals
-            new_values[jid] = new_val
-            max_diff = max(max_diff, abs(new_val - current_values[jid]))
-
-        current_values = new_values
+        new_values = []
+        converged = True
+        for i, agent in enumerate(agents):
+            old_val = agent.value
+            acc = old_val
+            num_vals = 1
+            box = message_boxes[i]
+            while box:
+                acc += box.popleft()[1]
+                num_vals += 1
+            # приём каждого значения, (num_vals - 1) сложений и одно деление
+            total_arith_ops += 2 * num_vals - 1
+
+            new_val = acc / num_vals
+            new_values.append(new_val)
+            # как только один агент сдвинулся на TARGET_PRECISION и больше,
+            # остальных можно не проверять
+            if converged:
+                diff = new_val - old_val
+                if diff >= TARGET_PRECISION or diff <= -TARGET_PRECISION:
+                    converged = False
+
+        for agent, new_val in zip(agents, new_values):
+            agent.value = new_val
         iterations_done += 1
 
         # === ВЫВОД СОСТОЯНИЯ НА ТЕКУЩЕЙ ИТЕРАЦИИ ===
-        print(f"--- Итерация {iterations_done} ---")
-        for i in range(NUM_AGENTS):
-            jid = f"agent{i}@localhost"
-            print(f"  Агент {i}: {current_values[jid]:.6f}")
-        print()
+        print(format_state(f"--- Итерация {iterations_done} ---", agents))
 
-        if max_diff < TARGET_PRECISION:
+        if converged:
             print(f"Общее среднее найдено на итерации {iterations_done}!")
             break
     else:
         print("Достигнут лимит итераций — возможно, сеть слишком разрежена.")
 
-    final_val = list(current_values.values())[0]
+    final_val = agents[0].value
     print(f"\nРезультат: {final_val:.6f}")
     print(f"Истинное среднее:     {true_mean:.6f}")
     print(f"Ошибка:               {abs(final_val - true_mean):.2e}")
@@ -175,4 +161,13 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(
+        description="Децентрализованное вычисление среднего агентами"
+    )
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="показать схему агентов перед вычислением",
+    )
+    args = parser.parse_args()
+    main(plot=args.plot)